@@ -10,17 +10,20 @@ class AES:
   management. Unless you need that, please use `encrypt` and `decrypt`.
   """
   rounds_by_key_size = {16: 10, 24: 12, 32: 14}
+  __slots__ = ('n_rounds', '_round_keys')
+
   def __init__(self, master_key):
       """
       Initializes the object with a given key.
       """
       assert len(master_key) in AES.rounds_by_key_size
       self.n_rounds = AES.rounds_by_key_size[len(master_key)]
-      self._key_matrices = self._expand_key(master_key)
+      self._round_keys = self._expand_key(master_key)
 
   def _expand_key(self, master_key):
       """
-      Expands and returns a list of key matrices for the given master_key.
+      Expands the given master_key and returns all round keys as one
+      contiguous bytes object, 16 bytes per round.
       """
       # Initialize round keys with raw key material.
       key_columns = bytes2matrix(master_key)
@@ -49,8 +52,7 @@ class AES:
           word = xor_bytes(word, key_columns[-iteration_size])
           key_columns.append(word)
 
-      # Group key words in 4x4 byte matrices.
-      return [key_columns[4*i : 4*(i+1)] for i in range(len(key_columns) // 4)]
+      return b''.join(bytes(word) for word in key_columns)
 
   def encrypt_block(self, plaintext):
       """
@@ -60,20 +62,29 @@ class AES:
 
       plain_state = bytes2matrix(plaintext)
 
-      add_round_key(plain_state, self._key_matrices[0])
+      round_keys = self._round_keys
+
+      add_round_key(plain_state, round_keys, 0)
 
       for i in range(1, self.n_rounds):
           sub_bytes(plain_state)
           shift_rows(plain_state)
           mix_columns(plain_state)
-          add_round_key(plain_state, self._key_matrices[i])
+          add_round_key(plain_state, round_keys, 16*i)
 
       sub_bytes(plain_state)
       shift_rows(plain_state)
-      add_round_key(plain_state, self._key_matrices[-1])
+      add_round_key(plain_state, round_keys, 16*self.n_rounds)
 
       return matrix2bytes(plain_state)
 
+  def encrypt_blocks(self, blocks):
+      """
+      Encrypts a list of independent 16 byte long blocks.
+      """
+      encrypt_block = self.encrypt_block
+      return [encrypt_block(block) for block in blocks]
+
   def decrypt_block(self, ciphertext):
       """
       Decrypts a single block of 16 byte long ciphertext.
@@ -82,17 +93,19 @@ class AES:
 
       cipher_state = bytes2matrix(ciphertext)
 
-      add_round_key(cipher_state, self._key_matrices[-1])
+      round_keys = self._round_keys
+
+      add_round_key(cipher_state, round_keys, 16*self.n_rounds)
       inv_shift_rows(cipher_state)
       inv_sub_bytes(cipher_state)
 
       for i in range(self.n_rounds - 1, 0, -1):
-          add_round_key(cipher_state, self._key_matrices[i])
+          add_round_key(cipher_state, round_keys, 16*i)
           inv_mix_columns(cipher_state)
           inv_shift_rows(cipher_state)
           inv_sub_bytes(cipher_state)
 
-      add_round_key(cipher_state, self._key_matrices[0])
+      add_round_key(cipher_state, round_keys, 0)
 
       return matrix2bytes(cipher_state)
 
@@ -23,10 +23,14 @@ def inv_shift_rows(s):
   s[0][2], s[1][2], s[2][2], s[3][2] = s[2][2], s[3][2], s[0][2], s[1][2]
   s[0][3], s[1][3], s[2][3], s[3][3] = s[1][3], s[2][3], s[3][3], s[0][3]
 
-def add_round_key(s, k):
-  for i in range(4):
-    for j in range(4):
-      s[i][j] ^= k[i][j]
+def add_round_key(s, k, offset=0):
+  """ XORs the state with the 16 byte round key found at `offset` in `k`. """
+  for row in s:
+    row[0] ^= k[offset]
+    row[1] ^= k[offset + 1]
+    row[2] ^= k[offset + 2]
+    row[3] ^= k[offset + 3]
+    offset += 4
 
 
 # learned from https://web.archive.org/web/20100626212235/http://cs.ucsb.edu/~koc/cs178/projects/JT/aes.c
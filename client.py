@@ -0,0 +1,61 @@
+import socket
+
+import protocol
+
+
+class ServiceError(Exception):
+  pass
+
+
+class Client:
+  """
+  Client for the local encryption service (see `server.py`). A single
+  connection is reused for every request.
+  """
+  def __init__(self, address=protocol.DEFAULT_ADDRESS):
+    family, addr = protocol.parse_address(address)
+    self.sock = socket.socket(family, socket.SOCK_STREAM)
+    self.sock.connect(addr)
+    if family == socket.AF_INET:
+      self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    self._read = self.sock.makefile('rb').read
+
+  def close(self):
+    self.sock.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def request(self, action, method, key_id, iv, data=b'', path=None):
+    """
+    Sends a request and returns an iterator over the response chunks as they
+    arrive, which must be consumed before the next request. `path` makes the
+    server read the input itself, from its data directory, instead of
+    sending `data`.
+    """
+    header = {'action': action, 'method': method, 'key_id': key_id, 'iv': iv.hex()}
+    if path is not None:
+      header['path'] = path
+      data = b''
+    self.sock.sendall(protocol.encode_header(header) + protocol.frame(data))
+
+    response = protocol.read_header(self._read)
+    if response['status'] != 'ok':
+      raise ServiceError(response['error'])
+    return self._chunks()
+
+  def _chunks(self):
+    while True:
+      chunk = protocol.read_frame(self._read)
+      if not chunk:
+        return
+      yield chunk
+
+  def encrypt(self, method, key_id, iv, data=b'', path=None):
+    return b''.join(self.request('encrypt', method, key_id, iv, data, path))
+
+  def decrypt(self, method, key_id, iv, data=b'', path=None):
+    return b''.join(self.request('decrypt', method, key_id, iv, data, path))
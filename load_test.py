@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+from client import Client
+import protocol
+
+
+def worker(address, args, iv, payload, latencies, errors):
+  """
+  Sends `args.requests` encrypt requests, each followed by a decrypt request
+  with `--verify`. Every request counts towards the latencies.
+  """
+  try:
+    with Client(address) as client:
+      for _ in range(args.requests):
+        start = time.perf_counter()
+        ciphertext = client.encrypt(args.method, args.key_id, iv, payload)
+        latencies.append(time.perf_counter() - start)
+        if args.verify:
+          start = time.perf_counter()
+          plaintext = client.decrypt(args.method, args.key_id, iv, ciphertext)
+          latencies.append(time.perf_counter() - start)
+          if plaintext != payload:
+            raise ValueError('Decrypted payload does not match')
+  except Exception as e:
+    errors.append(e)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Load test for the local AES encryption service.')
+  parser.add_argument('--address', default=protocol.DEFAULT_ADDRESS)
+  parser.add_argument('--key-id', required=True, help='key file name in the server keys directory')
+  parser.add_argument('--method', default='cbc', choices=protocol.METHODS)
+  parser.add_argument('--size', type=int, default=16, help='payload size in bytes')
+  parser.add_argument('--requests', type=int, default=1000, help='requests per connection')
+  parser.add_argument('--connections', type=int, default=1)
+  parser.add_argument('--verify', action='store_true', help='also decrypt every response and compare, decrypts are counted as requests')
+  args = parser.parse_args()
+
+  iv = os.urandom(16)
+  payload = os.urandom(args.size)
+  latencies = []
+  errors = []
+
+  threads = [threading.Thread(target=worker, args=(args.address, args, iv, payload, latencies, errors))
+             for _ in range(args.connections)]
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+
+  latencies.sort()
+  total = len(latencies)
+  if total:
+    print(f'Requests: {total} in {elapsed:.2f}s ({total / elapsed:.0f} req/s, '
+          f'{total * args.size / elapsed / 1024 / 1024:.2f} MiB/s)')
+    for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+      print(f'{name}: {latencies[min(total - 1, int(total * q))] * 1000:.3f} ms')
+  else:
+    print('No requests completed')
+
+  if errors:
+    for error in errors:
+      print(f'Error: {str(error) or type(error).__name__}')
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
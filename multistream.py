@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from AES.aes import AES
+from AES.helper_functions import pad, split_blocks, xor_bytes
+
+
+METHODS = ('cbc', 'pcbc')
+
+# Bytes read from each file at a time, a multiple of the block size.
+CHUNK_SIZE = 64 * 1024
+
+
+class _Stream:
+  """
+  One file being encrypted. Only the current chunk and the chaining state
+  are kept in memory, ciphertext is written out chunk by chunk.
+  """
+  def __init__(self, input_path, output_path, iv):
+    self.input = open(input_path, 'rb')
+    try:
+      self.output = open(output_path, 'wb')
+    except OSError:
+      self.input.close()
+      raise
+    self.prev_ciphertext = iv
+    self.prev_plaintext = bytes(16)
+    self.size = 0
+    self._blocks = []
+    self._position = 0
+    self._last = False
+    self.ciphertext = []
+
+  def next_block(self):
+    """
+    Returns the next plaintext block, None once the padding block is done.
+    """
+    if self._position == len(self._blocks):
+      self.flush()
+      if self._last:
+        return None
+      data = self.input.read(CHUNK_SIZE)
+      self.size += len(data)
+      # A short read means end of file, pad the final chunk only.
+      if len(data) < CHUNK_SIZE:
+        data = pad(data)
+        self._last = True
+      self._blocks = split_blocks(data)
+      self._position = 0
+    block = self._blocks[self._position]
+    self._position += 1
+    return block
+
+  def flush(self):
+    if self.ciphertext:
+      self.output.write(b''.join(self.ciphertext))
+      self.ciphertext = []
+
+  def close(self):
+    if self.output.closed:
+      return
+    try:
+      self.flush()
+    finally:
+      self.input.close()
+      self.output.close()
+
+
+def encrypt_streams(aes, jobs, iv, method='cbc', streams=8):
+  """
+  Encrypts (input path, output path) pairs in CBC or PCBC mode with PKCS#7
+  padding, keeping up to `streams` files open at once. Block i of every open
+  file goes through `aes.encrypt_blocks` in the same step, each file stays
+  serial. Output is identical to `encrypt_cbc`/`encrypt_pcbc` on each file.
+  Returns the number of plaintext bytes read.
+  """
+  assert len(iv) == 16
+  if method not in METHODS:
+    raise ValueError(f'Wrong method: {method}')
+
+  pending = iter(jobs)
+  active = []
+  total = 0
+  try:
+    while True:
+      while len(active) < streams:
+        job = next(pending, None)
+        if job is None:
+          break
+        active.append(_Stream(*job, iv))
+      if not active:
+        return total
+
+      current = []
+      inputs = []
+      for stream in active:
+        plaintext_block = stream.next_block()
+        if plaintext_block is None:
+          stream.close()
+          total += stream.size
+          continue
+        current.append(stream)
+        if method == 'cbc':
+          # CBC mode encrypt: encrypt(plaintext_block XOR previous)
+          inputs.append(xor_bytes(plaintext_block, stream.prev_ciphertext))
+        else:
+          # PCBC mode encrypt: encrypt(plaintext_block XOR (prev_ciphertext XOR prev_plaintext))
+          inputs.append(xor_bytes(plaintext_block, xor_bytes(stream.prev_ciphertext, stream.prev_plaintext)))
+          stream.prev_plaintext = plaintext_block
+      active = current
+
+      for stream, ciphertext_block in zip(active, aes.encrypt_blocks(inputs)):
+        stream.ciphertext.append(ciphertext_block)
+        stream.prev_ciphertext = ciphertext_block
+  finally:
+    for stream in active:
+      stream.close()
+
+
+def output_path(input_path, output_dir, method):
+  """
+  Returns <file name>-<method>.enc in `output_dir`. Unlike `fun.manage_output`
+  the whole file name is kept, so f1.txt and f1.md don't overwrite each other.
+  """
+  return os.path.join(output_dir, f'{os.path.basename(input_path)}-{method}.enc')
+
+
+def _encrypt_jobs(key, iv, method, jobs, streams):
+  """
+  Runs inside a worker process. Encrypts (input, output) path pairs, up to
+  `streams` files at a time, and returns the number of plaintext bytes read.
+  """
+  return encrypt_streams(AES(key), jobs, iv, method, streams)
+
+
+def encrypt_files(key, iv, paths, output_dir='./output_files/', method='cbc', streams=8, workers=None):
+  """
+  Encrypts every file in `paths` into `output_dir`, interleaving up to
+  `streams` files per worker process. Returns (plaintext bytes, seconds).
+  """
+  if method not in METHODS:
+    raise ValueError(f'Wrong method: {method}')
+  if streams < 1:
+    raise ValueError('streams must be at least 1')
+  if workers is not None and workers < 1:
+    raise ValueError('workers must be at least 1')
+  if not paths:
+    return 0, 0.0
+  workers = workers or os.cpu_count()
+
+  # Two inputs with the same file name would silently overwrite each other.
+  sources = {}
+  for path in paths:
+    out_path = output_path(path, output_dir, method)
+    if out_path in sources:
+      raise ValueError(f'{sources[out_path]} and {path} would both be written to {out_path}')
+    sources[out_path] = path
+
+  # Largest files first onto the least loaded worker; files of similar size
+  # then run side by side and finish their blocks together.
+  shares = [[] for _ in range(workers)]
+  loads = [0] * workers
+  for out_path, path in sorted(sources.items(), key=lambda item: os.path.getsize(item[1]), reverse=True):
+    n = loads.index(min(loads))
+    shares[n].append((path, out_path))
+    loads[n] += os.path.getsize(path)
+  shares = [share for share in shares if share]
+
+  start = time.perf_counter()
+  if len(shares) == 1:
+    total = _encrypt_jobs(key, iv, method, shares[0], streams)
+  else:
+    with ProcessPoolExecutor(len(shares)) as pool:
+      futures = [pool.submit(_encrypt_jobs, key, iv, method, share, streams) for share in shares]
+      total = sum(future.result() for future in futures)
+  return total, time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Encrypt many files in CBC/PCBC mode at once.')
+  parser.add_argument('files', nargs='*', help='files to encrypt, all of ./input_files/ by default')
+  parser.add_argument('--key', required=True, help='key file')
+  parser.add_argument('--salt', required=True, help='salt file, used as IV like in main.py')
+  parser.add_argument('--method', default='cbc', choices=METHODS)
+  parser.add_argument('--output-dir', default='./output_files/')
+  parser.add_argument('--streams', type=int, default=8, help='files interleaved per worker')
+  parser.add_argument('--workers', type=int, default=None)
+  args = parser.parse_args()
+
+  try:
+    with open(args.key, 'rb') as file:
+      key = file.read()
+    with open(args.salt, 'rb') as file:
+      salt = file.read()
+    files = args.files
+    if not files:
+      files = [os.path.join('./input_files/', name) for name in os.listdir('./input_files/')]
+      files = [path for path in files if os.path.isfile(path)]
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    total, elapsed = encrypt_files(key, salt, files, args.output_dir, args.method, args.streams, args.workers)
+    speed = total / elapsed / 1024 if elapsed else 0.0
+    print(f'Encrypted {len(files)} files, {total} bytes in {elapsed:.2f}s ({speed:.1f} KiB/s)')
+  except Exception as e:
+    print(f'Error: {str(e)}')
+
+
+if __name__ == '__main__':
+  main()
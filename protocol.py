@@ -0,0 +1,74 @@
+import json
+import socket
+import struct
+
+
+METHODS = ('cbc', 'pcbc', 'cfb', 'ofb', 'ctr')
+ACTIONS = ('encrypt', 'decrypt')
+
+DEFAULT_ADDRESS = 'unix:./aes.sock'
+CHUNK_SIZE = 64 * 1024
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+_length = struct.Struct('>I')
+
+
+class ProtocolError(Exception):
+  pass
+
+
+def parse_address(address):
+  """
+  Parses `unix:/path/to/socket` or `host:port` into a (family, address) pair
+  suitable for `socket.socket` and `connect`/`bind`.
+  """
+  if address.startswith('unix:'):
+    return socket.AF_UNIX, address[len('unix:'):]
+  host, _, port = address.rpartition(':')
+  if not host or not port.isdigit():
+    raise ValueError(f'Wrong address: {address}')
+  return socket.AF_INET, (host, int(port))
+
+
+def frame(data):
+  """ Prefixes `data` with its 4 byte big-endian length. """
+  return _length.pack(len(data)) + data
+
+
+def encode_header(header):
+  return frame(json.dumps(header, separators=(',', ':')).encode('utf8'))
+
+
+def read_exact(read, size):
+  """
+  Reads exactly `size` bytes with `read`, raising EOFError if the peer closed
+  the connection before the first byte and ProtocolError in the middle of a frame.
+  """
+  data = read(size)
+  if len(data) == size:
+    return data
+  if not data:
+    raise EOFError
+  chunks = [data]
+  missing = size - len(data)
+  while missing:
+    data = read(missing)
+    if not data:
+      raise ProtocolError('Connection closed in the middle of a frame')
+    chunks.append(data)
+    missing -= len(data)
+  return b''.join(chunks)
+
+
+def read_frame(read):
+  """
+  Reads one length prefixed frame.
+  """
+  size, = _length.unpack(read_exact(read, _length.size))
+  if size > MAX_FRAME_SIZE:
+    raise ProtocolError(f'Frame of {size} bytes is too big')
+  return read_exact(read, size) if size else b''
+
+
+def read_header(read):
+  return json.loads(read_frame(read).decode('utf8'))
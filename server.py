@@ -0,0 +1,247 @@
+import argparse
+import ipaddress
+import os
+import socket
+import socketserver
+import stat
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from AES.aes import AES
+import protocol
+
+
+# Payloads smaller than this are handled inline, sending them to a worker
+# process costs more than encrypting them.
+POOL_THRESHOLD = 16 * 1024
+
+_worker_ciphers = {}
+
+
+def run_cipher(aes, action, method, iv, data):
+  """
+  Calls `aes.<action>_<method>(data, iv)`.
+  """
+  if action not in protocol.ACTIONS:
+    raise ValueError(f'Wrong action: {action}')
+  if method not in protocol.METHODS:
+    raise ValueError(f'Wrong method: {method}')
+  if len(iv) != 16:
+    raise ValueError('IV must be 16 bytes long')
+  if action == 'encrypt' or method not in ('cbc', 'pcbc'):
+    return getattr(aes, f'{action}_{method}')(data, iv)
+
+  if not data or len(data) % 16:
+    raise ValueError('Decrypt failed: ciphertext must be made of full 16 byte blocks')
+  try:
+    return getattr(aes, f'{action}_{method}')(data, iv)
+  except AssertionError:
+    raise ValueError('Decrypt failed: wrong padding') from None
+
+
+def _pool_job(key, action, method, iv, data):
+  """
+  Runs inside a worker process, which keeps its own cache of expanded keys.
+  """
+  aes = _worker_ciphers.get(key)
+  if aes is None:
+    aes = _worker_ciphers[key] = AES(key)
+  return run_cipher(aes, action, method, iv, data)
+
+
+class KeyCache:
+  """
+  Keeps keys from `keys_dir` expanded in memory, keyed by their file name.
+  """
+  def __init__(self, keys_dir):
+    self.keys_dir = keys_dir
+    self._ciphers = {}
+    self._lock = threading.Lock()
+
+  def get(self, key_id):
+    """
+    Returns (key, AES) for `key_id`, loading it from disk on first use.
+    """
+    entry = self._ciphers.get(key_id)
+    if entry is not None:
+      return entry
+    if not key_id or os.path.basename(key_id) != key_id:
+      raise ValueError(f'Wrong key id: {key_id}')
+    try:
+      with open(os.path.join(self.keys_dir, key_id), 'rb') as file:
+        key = file.read()
+    except FileNotFoundError:
+      raise ValueError(f'Unknown key id: {key_id}') from None
+    if len(key) not in AES.rounds_by_key_size:
+      raise ValueError(f'Key {key_id} must be 16, 24 or 32 bytes long')
+    with self._lock:
+      entry = self._ciphers.setdefault(key_id, (key, AES(key)))
+    return entry
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+  """
+  Serves requests of one connection until the client disconnects.
+
+  Request:  header frame (JSON with action, method, key_id, iv in hex and an
+            optional path, a file name inside the server data directory)
+            followed by a payload frame, empty when path is set.
+  Response: header frame (JSON with status and length or error) followed, on
+            success, by data frames of up to CHUNK_SIZE ended by an empty frame.
+
+  The whole input is read and the whole result computed before the response
+  goes out; the data frames only keep single writes small.
+  """
+  def setup(self):
+    super().setup()
+    if self.server.address_family == socket.AF_INET:
+      self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+  def handle(self):
+    read = self.rfile.read
+    # A client that goes away mid-request or mid-response raises OSError,
+    # there is nobody left to answer so just drop the connection.
+    try:
+      while True:
+        try:
+          header = protocol.read_header(read)
+          payload = protocol.read_frame(read)
+        except EOFError:
+          return
+        except (protocol.ProtocolError, ValueError) as e:
+          # The stream can't be trusted after a broken frame, drop the connection.
+          self.send_error(e)
+          return
+
+        try:
+          message = self.process(header, payload)
+        except Exception as e:
+          self.send_error(e)
+          continue
+
+        self.send_message(message)
+    except OSError:
+      return
+
+  def process(self, header, payload):
+    key, aes = self.server.keys.get(header.get('key_id'))
+    iv = bytes.fromhex(header.get('iv', ''))
+    action = header.get('action')
+    method = header.get('method')
+
+    path = header.get('path')
+    if path:
+      if os.path.basename(path) != path or path in ('.', '..'):
+        raise ValueError(f'Wrong path: {path}')
+      try:
+        with open(os.path.join(self.server.data_dir, path), 'rb') as file:
+          payload = file.read()
+      except FileNotFoundError:
+        raise ValueError(f'Unknown path: {path}') from None
+
+    if len(payload) < POOL_THRESHOLD or self.server.pool is None:
+      return run_cipher(aes, action, method, iv, payload)
+    return self.server.pool.submit(_pool_job, key, action, method, iv, payload).result()
+
+  def send_error(self, error):
+    self.wfile.write(protocol.encode_header({'status': 'error', 'error': str(error) or type(error).__name__}))
+    self.wfile.flush()
+
+  def send_message(self, message):
+    view = memoryview(message)
+    # Small responses go out in a single write together with the header.
+    out = [protocol.encode_header({'status': 'ok', 'length': len(message)})]
+    for i in range(0, len(view), protocol.CHUNK_SIZE):
+      out.append(protocol.frame(view[i:i+protocol.CHUNK_SIZE].tobytes()))
+      if i:
+        self.wfile.write(b''.join(out))
+        out = []
+    out.append(protocol.frame(b''))
+    self.wfile.write(b''.join(out))
+    self.wfile.flush()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+  daemon_threads = True
+  allow_reuse_address = True
+
+
+def _remove_stale_socket(path):
+  """
+  Removes a socket file left behind by a server that is no longer running.
+  Refuses to touch anything else.
+  """
+  try:
+    mode = os.stat(path).st_mode
+  except FileNotFoundError:
+    return
+  if not stat.S_ISSOCK(mode):
+    raise ValueError(f'{path} exists and is not a socket')
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    try:
+      sock.connect(path)
+    except ConnectionRefusedError:
+      os.unlink(path)
+      return
+  raise ValueError(f'Another server is already listening on {path}')
+
+
+def _check_loopback(host, port):
+  """
+  The service has no authentication, so it must not be reachable from
+  other machines.
+  """
+  for *_, sockaddr in socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM):
+    if not ipaddress.ip_address(sockaddr[0]).is_loopback:
+      raise ValueError(f'Refusing to listen on non-loopback address {host}')
+
+
+def make_server(address, keys_dir='./keys/', data_dir='./input_files/', workers=None):
+  """
+  Creates a server listening on `address` (see `protocol.parse_address`).
+  TCP addresses must be loopback ones, the Unix socket is only accessible
+  to its owner. Requests with a path read files from `data_dir` only.
+  `workers=0` disables the process pool.
+  """
+  family, addr = protocol.parse_address(address)
+  if family == socket.AF_UNIX:
+    _remove_stale_socket(addr)
+    server = UnixServer(addr, RequestHandler)
+    os.chmod(addr, 0o600)
+  else:
+    _check_loopback(*addr)
+    server = TCPServer(addr, RequestHandler)
+  server.keys = KeyCache(keys_dir)
+  server.data_dir = data_dir
+  server.pool = ProcessPoolExecutor(workers or os.cpu_count()) if workers != 0 else None
+  return server
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Local AES encryption service.')
+  parser.add_argument('--address', default=protocol.DEFAULT_ADDRESS, help='unix:/path or localhost:port')
+  parser.add_argument('--keys-dir', default='./keys/')
+  parser.add_argument('--data-dir', default='./input_files/', help='directory request paths are read from')
+  parser.add_argument('--workers', type=int, default=None, help='worker processes, 0 to disable the pool')
+  args = parser.parse_args()
+
+  server = make_server(args.address, args.keys_dir, args.data_dir, args.workers)
+  print(f'Listening on {args.address}')
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    if server.pool is not None:
+      server.pool.shutdown()
+    if server.address_family == socket.AF_UNIX:
+      os.unlink(server.server_address)
+
+
+if __name__ == '__main__':
+  main()